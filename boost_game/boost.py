@@ -5,11 +5,13 @@ Boost game implementation, AI, and command line interface.
 from argparse import ArgumentParser
 from enum import Enum
 from math import inf
-from math import floor
 import random
+import re
 from sys import stderr, stdout
 from time import time
-from heapq import heapify, heappop, heappush
+from heapq import heappop, heappush
+from functools import lru_cache
+from itertools import count
 
 from .rulesets import rulesets, DEFAULT_RULESET
 
@@ -25,6 +27,10 @@ COLOR = None
 EMPTY_CELL_SHORT = "."
 EMPTY_CELL_LONG = ". "
 
+# A cell, optionally followed by a second one (e.g. d2 or a1b2), in the form
+# accepted by Board.parse_move
+MOVE_PATTERN = re.compile(r"[a-z][0-9](?:[a-z][0-9])?", re.IGNORECASE)
+
 DRAGON_OWNER = 0
 OWNER_COLORS = ["green", "red", "blue", "yellow", "magenta", "cyan", "white"]
 
@@ -39,6 +45,9 @@ ACTIVE_PAWN_SCORE = 1
 ACTIVE_KNIGHT_SCORE = 2
 MOBILE_KNIGHT_SCORE = 1  # Multiplied by boost
 
+# Row and column offsets to the orthogonal neighbors of a cell
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
 
 def distance(row1, col1, row2, col2):
     # Manhattan distance
@@ -50,6 +59,8 @@ def cell_distance(cell1, cell2):
 
 
 class Cell:
+    __slots__ = ("row", "col")
+
     def __init__(self, row, col):
         self.row = row
         self.col = col
@@ -64,12 +75,16 @@ class Cell:
         return str(self)
 
     def __eq__(self, other):
+        # Cells on the board are shared, so most comparisons are identities
+        if self is other:
+            return True
         if isinstance(other, Cell):
             return self.row == other.row and self.col == other.col
         return False
 
     def __hash__(self):
-        return hash((self.row, self.col))
+        # Avoids building a tuple; unique for any board narrower than 2^16
+        return (self.row << 16) + self.col
 
     @property
     def neighbors(self):
@@ -81,7 +96,114 @@ class Cell:
         ]
 
 
+# The cell tables below depend only on the size of the board, so they are
+# built once per size and shared by every board of that size
+
+
+@lru_cache(maxsize=None)
+def get_cell_grid(width, height):
+    # Every cell on the board, indexed by row and then column
+    return tuple(
+        tuple(Cell(row, col) for col in range(width)) for row in range(height)
+    )
+
+
+@lru_cache(maxsize=None)
+def get_cells(width, height):
+    return tuple(cell for row in get_cell_grid(width, height) for cell in row)
+
+
+@lru_cache(maxsize=None)
+def get_tower_cells(width, height):
+    # Cells that are not on the border, where towers can be built
+    return tuple(
+        cell
+        for row in get_cell_grid(width, height)[1:-1]
+        for cell in row[1:-1]
+    )
+
+
+@lru_cache(maxsize=None)
+def get_neighbor_table(width, height):
+    # For each cell, the tuple of its orthogonal neighbors that lie on the
+    # board, indexed by row and then column
+    cells = get_cell_grid(width, height)
+    return tuple(
+        tuple(
+            tuple(
+                cells[row + row_offset][col + col_offset]
+                for row_offset, col_offset in DIRECTIONS
+                if 0 <= row + row_offset < height
+                and 0 <= col + col_offset < width
+            )
+            for col in range(width)
+        )
+        for row in range(height)
+    )
+
+
+# The tables below are indexed by flat cell indices (row * width + col), the
+# layout of Board.board
+
+
+@lru_cache(maxsize=None)
+def get_neighbor_indices(width, height):
+    # For each cell index, the tuple of the indices of its neighbors
+    return tuple(
+        tuple(
+            neighbor.row * width + neighbor.col
+            for neighbor in get_neighbor_table(width, height)[row][col]
+        )
+        for row in range(height)
+        for col in range(width)
+    )
+
+
+@lru_cache(maxsize=None)
+def get_neighbor_masks(width, height):
+    # For each cell index, a bitboard of its neighbors
+    return tuple(
+        sum(1 << neighbor for neighbor in neighbors)
+        for neighbors in get_neighbor_indices(width, height)
+    )
+
+
+@lru_cache(maxsize=None)
+def get_distance_table(width, height):
+    # For each pair of cell indices, the Manhattan distance between them
+    return tuple(
+        tuple(
+            distance(row1, col1, row2, col2)
+            for row2 in range(height)
+            for col2 in range(width)
+        )
+        for row1 in range(height)
+        for col1 in range(width)
+    )
+
+
+# Fixed seed, so that Zobrist hashes are the same in every run
+ZOBRIST_SEED = 0xB0057
+
+
+@lru_cache(maxsize=None)
+def get_zobrist_keys(width, height):
+    # For each cell index, a random 64-bit key for every piece code
+    # The hash of a board is the XOR of the keys of its pieces, so empty
+    # cells (code 0) have a key of 0
+    rng = random.Random(ZOBRIST_SEED)
+    return tuple(
+        (0,)
+        + tuple(
+            rng.getrandbits(64) for code in range(1, MAX_OWNERS << OWNER_SHIFT)
+        )
+        for index in range(width * height)
+    )
+
+
 class PieceType:
+    __slots__ = ("name", "symbol", "score")
+
     def __init__(self, name, symbol, score=0):
         self.name = name
         self.symbol = symbol
@@ -95,7 +217,34 @@ class PieceTypes(Enum):
     TOWER = PieceType("Tower", "T", TOWER_SCORE)
 
 
+# Lookup table for piece types, so that validation does not need to iterate
+# over the enum
+# IDs start at 1, since a piece code of 0 marks an empty cell
+PIECE_TYPE_IDS = {
+    piece_type: i for i, piece_type in enumerate(PieceTypes, start=1)
+}
+
+# Pieces are stored on the board as single byte codes, with the owner in the
+# high bits and the piece type ID in the low bits
+OWNER_SHIFT = 4
+PIECE_TYPE_MASK = (1 << OWNER_SHIFT) - 1
+MAX_OWNERS = 256 >> OWNER_SHIFT
+EMPTY = 0
+
+DRAGON_ID = PIECE_TYPE_IDS[PieceTypes.DRAGON]
+PAWN_ID = PIECE_TYPE_IDS[PieceTypes.PAWN]
+KNIGHT_ID = PIECE_TYPE_IDS[PieceTypes.KNIGHT]
+TOWER_ID = PIECE_TYPE_IDS[PieceTypes.TOWER]
+DRAGON_CODE = (DRAGON_OWNER << OWNER_SHIFT) | DRAGON_ID
+
+
+def piece_code(owner, piece_id):
+    return (owner << OWNER_SHIFT) | piece_id
+
+
 class Piece:
+    __slots__ = ("owner", "piece_type")
+
     def __init__(self, owner, piece_type):
         # assert isinstance(owner, int)
         # assert owner >= 0
@@ -105,9 +254,13 @@ class Piece:
         self.piece_type = piece_type
 
     def __str__(self):
-        return str(self.piece_type.value.symbol) + str(self.owner)
+        return PIECE_STRINGS[self.code]
 
     def __eq__(self, other):
+        # Pieces are shared through CODE_TO_PIECE, so most comparisons are
+        # identities
+        if self is other:
+            return True
         if isinstance(other, Piece):
             return (
                 self.owner == other.owner
@@ -134,20 +287,85 @@ class Piece:
     def valid(self):
         return (
             self.owner >= 0
-            and self.piece_type in PieceTypes
+            and self.piece_type in PIECE_TYPE_IDS
             and (self.owner == DRAGON_OWNER)
             == (self.piece_type is PieceTypes.DRAGON)
         )
 
+    @property
+    def code(self):
+        return piece_code(self.owner, PIECE_TYPE_IDS[self.piece_type])
+
     @staticmethod
     def parse(string):
+        return STRING_TO_PIECE.get(string)
+
+
+def build_code_tables():
+    # The decoded piece and string form (e.g. "P1") for every piece code
+    # (None for empty cells)
+    pieces = [None] * (MAX_OWNERS << OWNER_SHIFT)
+    strings = [None] * (MAX_OWNERS << OWNER_SHIFT)
+    for owner in range(MAX_OWNERS):
         for piece_type in PieceTypes:
-            if piece_type.value.symbol == string[0]:
-                return Piece(int(string[1]), piece_type)
-        return None
+            code = piece_code(owner, PIECE_TYPE_IDS[piece_type])
+            pieces[code] = Piece(owner, piece_type)
+            strings[code] = piece_type.value.symbol + str(owner)
+    return pieces, strings
+
+
+CODE_TO_PIECE, PIECE_STRINGS = build_code_tables()
+# Every piece and piece code by its string form, for parsing
+STRING_TO_PIECE = {
+    string: piece
+    for piece, string in zip(CODE_TO_PIECE, PIECE_STRINGS)
+    if piece is not None
+}
+STRING_TO_CODE = {
+    string: code
+    for code, string in enumerate(PIECE_STRINGS)
+    if string is not None
+}
+# Static evaluation score of each piece code (0 for empty cells)
+CODE_SCORES = [
+    0 if piece is None else piece.piece_type.value.score
+    for piece in CODE_TO_PIECE
+]
+# How each piece code is written by Board.__str__
+CODE_STRINGS = [
+    EMPTY_CELL_LONG + " " if string is None else string + " "
+    for string in PIECE_STRINGS
+]
+
+
+@lru_cache(maxsize=128)
+def parse_board_string(string, width, height):
+    # The (index, code) writes described by a board string, such as a
+    # ruleset's starting position, parsed once per string and size
+    # Any string passed to Board.load lands here, so the cache is bounded
+    writes = []
+    row, col = 0, 0
+    for line in string.splitlines():
+        if row < height:
+            for (piece_type_string, owner_string) in zip(line[0::], line[1::]):
+                if col < width:
+                    piece_string = piece_type_string + owner_string
+                    # Parse straight to a piece code, without a Piece
+                    code = STRING_TO_CODE.get(piece_string, EMPTY)
+                    if code or piece_string == EMPTY_CELL_LONG:
+                        writes.append((row * width + col, code))
+                        col += 1
+
+        # Ignore blank lines
+        if col > 0:
+            row += 1
+            col = 0
+    return tuple(writes)
 
 
 class Move:
+    __slots__ = ("start", "end")
+
     def __init__(self, start, end=None):
         self.start = start
         self.end = end if end is not None else start
@@ -159,6 +377,8 @@ class Move:
         return str(self)
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if isinstance(other, Move):
             return self.start == other.start and self.end == other.end
         return False
@@ -172,9 +392,10 @@ class Move:
 
 
 class Path:
-    def __init__(self, path, heuristic=0):
+    __slots__ = ("path",)
+
+    def __init__(self, path):
         self.path = path
-        self.heuristic = heuristic
 
     @property
     def start(self):
@@ -184,19 +405,6 @@ class Path:
     def end(self):
         return self.path[-1] if self.path else None
 
-    @property
-    def total_heuristic(self):
-        return len(self.path) + self.heuristic
-
-    def __lt__(self, other):
-        return self.total_heuristic < other.total_heuristic
-
-    def __gt__(self, other):
-        return self.total_heuristic > other.total_heuristic
-
-    def __eq__(self, other):
-        return self.total_heuristic == other.total_heuristic
-
     def __len__(self):
         return len(self.path) - 1
 
@@ -208,36 +416,73 @@ class Path:
 
 
 class Board:
-    def __init__(self, ruleset, board=None):
+    # Boards are copied for every position the AI searches
+    __slots__ = (
+        "ruleset",
+        "width",
+        "height",
+        "cell_grid",
+        "cells",
+        "tower_cells",
+        "neighbor_table",
+        "neighbor_indices",
+        "neighbor_masks",
+        "distance_table",
+        "zobrist_keys",
+        "boosts",
+        "occupied",
+        "dragons",
+        "pretty_cache",
+        "board",
+        "piece_counts",
+        "zobrist",
+        "owners",
+        "forfeited",
+        "journal",
+    )
+
+    def __init__(self, ruleset, board=None, rng=None):
         self.ruleset = ruleset
-        self.board = Board.empty(ruleset.width, ruleset.height)
+        # Cache the dimensions as plain integers for cheap bounds checks
+        self.width = ruleset.width
+        self.height = ruleset.height
+        self.cell_grid = get_cell_grid(self.width, self.height)
+        self.cells = get_cells(self.width, self.height)
+        self.tower_cells = get_tower_cells(self.width, self.height)
+        self.neighbor_table = get_neighbor_table(self.width, self.height)
+        self.neighbor_indices = get_neighbor_indices(self.width, self.height)
+        self.neighbor_masks = get_neighbor_masks(self.width, self.height)
+        self.distance_table = get_distance_table(self.width, self.height)
+        self.zobrist_keys = get_zobrist_keys(self.width, self.height)
+        # Rendering of pretty along with the COLOR setting it was rendered
+        # with, discarded whenever the grid changes
+        self.pretty_cache = None
+        # When set to a list, every write to the grid is recorded in it as an
+        # (index, previous code) pair, so that it can be undone
+        self.journal = None
         if board:
             # Deep copy
-            self.owners = 0
-            for row in range(len(self.board)):
-                for col in range(len(self.board[row])):
-                    if board[row][col] is not None:
-                        self.board[row][col] = board[row][col]
-                        self.owners = max(self.owners, board[row][col].owner)
-            # Account for the dragon owner
-            self.owners += 1
+            self.board = bytearray(board)
+            self.recount()
         else:
+            self.board = Board.empty(ruleset.width, ruleset.height)
             self.load(ruleset.board_string)
-            self.place_dragons(ruleset.dragons)
+            self.place_dragons(ruleset.dragons, rng)
         self.forfeited = set()
-        self.piece_counts_cache = None
 
-    @property
-    def width(self):
-        return len(self.board[0])
-
-    @property
-    def height(self):
-        return len(self.board)
+    def reset(self, rng=None):
+        # Sets up the starting position of the ruleset again, reusing the
+        # grid and lookup tables of this board
+        self.board[:] = Board.empty(self.width, self.height)
+        self.load(self.ruleset.board_string)
+        self.place_dragons(self.ruleset.dragons, rng)
+        self.forfeited = set()
 
     @staticmethod
     def empty(width, height):
-        return [[None for col in range(width)] for row in range(height)]
+        # A single bytearray of piece codes, in row-major order, so the cell
+        # at (row, col) is at index row * width + col
+        return bytearray(width * height)
 
     def copy(self):
         new_board = Board(self.ruleset, self.board)
@@ -245,20 +490,18 @@ class Board:
         return new_board
 
     def __str__(self):
-        string = ""
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                if self.board[row][col]:
-                    string += str(self.board[row][col])
-                else:
-                    string += EMPTY_CELL_LONG
-                string += " "
-            string += "\n"
-        # Slice off trailing newline
-        return string[:-1]
+        # Maps each code through CODE_STRINGS in C, rather than in a Python
+        # loop
+        board = self.board
+        width = self.width
+        code_string = CODE_STRINGS.__getitem__
+        return "\n".join(
+            "".join(map(code_string, board[row : row + width]))
+            for row in range(0, len(board), width)
+        )
 
     def __hash__(self):
-        return hash(str(self))
+        return self.zobrist
 
     @property
     def cell_width(self):
@@ -266,82 +509,137 @@ class Board:
 
     @property
     def pretty(self):
-        file_labels = "  "
-        for col in range(len(self.board[0])):
-            file_labels += f"{chr(col + 65)}" + (self.cell_width - 1) * " "
-        string = file_labels + "\n"
-        horizontal_border = "─" * (self.cell_width * len(self.board[0]) - 1)
-        string += f" ┌{horizontal_border}┐\n"
-        for row in range(len(self.board)):
-            row_string = f"{len(self.board) - row}"
-            string += row_string + "│"
-            for col in range(len(self.board[row])):
-                piece = self.board[row][col]
+        # Rendered at most once per position, since the bot and CLI may ask
+        # for it several times between moves
+        if self.pretty_cache is not None and self.pretty_cache[0] == COLOR:
+            return self.pretty_cache[1]
+
+        # Built as a list of parts and joined once at the end
+        cell_width = self.cell_width
+        width = self.width
+        height = self.height
+        file_labels = "  " + "".join(
+            chr(col + 65) + (cell_width - 1) * " " for col in range(width)
+        )
+        horizontal_border = "─" * (cell_width * width - 1)
+        empty_cell = EMPTY_CELL_SHORT if cell_width == 2 else EMPTY_CELL_LONG
+        parts = [file_labels, "\n", f" ┌{horizontal_border}┐\n"]
+        for row in range(height):
+            row_string = f"{height - row}"
+            parts.append(row_string + "│")
+            for col in range(width):
+                piece = CODE_TO_PIECE[self.board[row * width + col]]
                 if piece:
                     if COLOR:
-                        string += colored(piece.symbol.upper(), piece.color)
+                        parts.append(
+                            colored(piece.symbol.upper(), piece.color)
+                        )
                     else:
-                        string += self.format_piece(piece)
+                        parts.append(self.format_piece(piece))
                 else:
-                    if self.cell_width == 2:
-                        string += EMPTY_CELL_SHORT
-                    else:
-                        string += EMPTY_CELL_LONG
-                if col < len(self.board[row]) - 1:
-                    string += " "
-                else:
-                    string += "│"
-            string += row_string + "\n"
-        string += f" └{horizontal_border}┘\n"
-        string += file_labels
-        return string
-
-    @property
-    def cells(self):
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                yield Cell(row, col)
+                    parts.append(empty_cell)
+                parts.append(" " if col < width - 1 else "│")
+            parts.append(row_string + "\n")
+        parts.append(f" └{horizontal_border}┘\n")
+        parts.append(file_labels)
+        pretty = "".join(parts)
+        self.pretty_cache = (COLOR, pretty)
+        return pretty
 
     def __iter__(self):
         yield from self.cells
 
-    @property
-    def tower_cells(self):
-        for row in range(1, len(self.board) - 1):
-            for col in range(1, len(self.board[row]) - 1):
-                yield Cell(row, col)
-
-    @property
-    def piece_counts(self):
-        if self.piece_counts_cache is not None:
-            return self.piece_counts_cache
+    def revert(self, journal):
+        # Undoes the writes recorded in the given journal
+        for index, code in reversed(journal):
+            self._place(index, code)
 
+    def recount(self):
+        # Rebuilds piece_counts, zobrist, occupied, dragons, boosts and owners
+        # from the grid
+        board = self.board
+        zobrist_keys = self.zobrist_keys
         piece_counts = {}
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                piece = self.get_piece(Cell(row, col))
-                if piece is not None:
-                    if piece in piece_counts:
-                        piece_counts[piece] += 1
-                    else:
-                        piece_counts[piece] = 1
-        self.piece_counts_cache = piece_counts
-        return piece_counts
+        zobrist = 0
+        occupied = 0
+        dragons = 0
+        owners = 0
+        for index, code in enumerate(board):
+            if code:
+                piece_counts[code] = piece_counts.get(code, 0) + 1
+                zobrist ^= zobrist_keys[index][code]
+                occupied |= 1 << index
+                if code == DRAGON_CODE:
+                    dragons |= 1 << index
+                owners = max(owners, code >> OWNER_SHIFT)
+        # Number of each piece on the board by piece code, kept up to date by
+        # _place
+        self.piece_counts = piece_counts
+        # Zobrist hash of the grid, also kept up to date by _place
+        self.zobrist = zobrist
+        self.pretty_cache = None
+        # Bitboard of the occupied cells, with bit i set if the cell at index
+        # i holds a piece, also kept up to date by _place
+        self.occupied = occupied
+        # Bitboard of the cells holding dragons, also kept up to date by
+        # _place
+        self.dragons = dragons
+        # Boost of each cell by index (1 plus its occupied neighbors), also
+        # kept up to date by _place
+        self.boosts = bytearray(
+            1 + sum(1 for neighbor in neighbors if board[neighbor])
+            for neighbors in self.neighbor_indices
+        )
+        # Account for the dragon owner
+        self.owners = owners + 1
+
+    def _place(self, index, code):
+        # Every write to the grid goes through here to keep piece_counts,
+        # zobrist, occupied, dragons and boosts current
+        piece_counts = self.piece_counts
+        old_code = self.board[index]
+        if old_code:
+            if piece_counts[old_code] == 1:
+                del piece_counts[old_code]
+            else:
+                piece_counts[old_code] -= 1
+        if code:
+            piece_counts[code] = piece_counts.get(code, 0) + 1
+        keys = self.zobrist_keys[index]
+        self.zobrist ^= keys[old_code] ^ keys[code]
+        if self.journal is not None:
+            self.journal.append((index, old_code))
+        self.board[index] = code
+        self.pretty_cache = None
+        # Filling or emptying a cell changes the boost of its neighbors
+        if bool(old_code) != bool(code):
+            self.occupied ^= 1 << index
+            delta = 1 if code else -1
+            boosts = self.boosts
+            for neighbor in self.neighbor_indices[index]:
+                boosts[neighbor] += delta
+        if (old_code == DRAGON_CODE) != (code == DRAGON_CODE):
+            self.dragons ^= 1 << index
 
     def get_owned_pieces(self, owners):
         if not isinstance(owners, list):
             owners = [owners]
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                piece = self.get_piece(Cell(row, col))
-                if piece is not None and piece.owner in owners:
-                    yield piece
+        for code in self.board:
+            piece = CODE_TO_PIECE[code]
+            if piece is not None and piece.owner in owners:
+                yield piece
 
     def parse_cell(self, string):
         row_string = string[0]
         col_string = string[1]
         row = self.height - int(col_string)
         col = ord(row_string.upper()) - 65
+        return self.get_cell(row, col)
+
+    def get_cell(self, row, col):
+        # Returns the shared instance for cells on the board
+        if 0 <= row < self.height and 0 <= col < self.width:
+            return self.cell_grid[row][col]
         return Cell(row, col)
 
     def format_cell(self, cell):
@@ -364,67 +662,63 @@ class Board:
         return symbol.lower() if piece.owner == 1 else symbol.upper()
 
     def load(self, string):
-        row, col = 0, 0
-        self.owners = 0
-        for line in string.splitlines():
-            if row < len(self.board):
-                for (piece_type_string, owner_string) in zip(
-                    line[0::], line[1::]
-                ):
-                    if col < len(self.board[row]):
-                        piece_string = piece_type_string + owner_string
-                        piece = Piece.parse(piece_string)
-                        self.board[row][col] = piece
-                        if piece:
-                            if piece.owner > self.owners:
-                                self.owners = piece.owner
-                        if piece or piece_string == EMPTY_CELL_LONG:
-                            col += 1
-
-            # Ignore blank lines
-            if col > 0:
-                row += 1
-                col = 0
-
-        # Account for the dragon owner
-        self.owners += 1
-
-    def place_dragons(self, dragons):
+        # Writes the parsed codes straight into the grid, then rebuilds the
+        # derived state once rather than per cell
+        board = self.board
+        for index, code in parse_board_string(string, self.width, self.height):
+            board[index] = code
+        self.recount()
+
+    def place_dragons(self, dragons, rng=None):
         assert dragons >= 0
         if dragons == 0:
             return
 
-        middle_row = floor(self.height / 2)
-        middle_col = floor(self.width / 2)
+        # Fall back to the global random number generator if none is given
+        if rng is None:
+            rng = random
+
+        board = self.board
+        width = self.width
+        middle_row = self.height >> 1
+        middle_col = width >> 1
+        # Indices of the cells that dragons may be placed on
         available_cells = []
         for row in range(self.height):
             for col in range(middle_col - 1):
-                if not self.board[row][col]:
-                    available_cells.append(Cell(row, col))
+                if not board[row * width + col]:
+                    available_cells.append(row * width + col)
 
         # To place an odd number of dragons, we have to place one in the
         # middle, since it's the only non-mirrored cell
         remaining_dragons = dragons
-        dragon = Piece(DRAGON_OWNER, PieceTypes.DRAGON)
         if dragons % 2 != 0:
-            if self.board[middle_row][middle_col]:
+            middle = middle_row * width + middle_col
+            if board[middle]:
                 raise ValueError(
                     "Cannot place an odd number of dragons on this board "
                     "(center must be unoccupied)"
                 )
-            self.board[middle_row][middle_col] = dragon
+            self._place(middle, DRAGON_CODE)
             remaining_dragons -= 1
 
         while remaining_dragons > 0:
-            cell = random.choice(available_cells)
-            available_cells.remove(cell)
-
-            mirror_row = self.height - cell.row - 1
-            mirror_col = self.width - cell.col - 1
-            mirror_cell = Cell(mirror_row, mirror_col)
-            if not self.get_piece(mirror_cell):
-                self.set_piece(cell, dragon)
-                self.set_piece(mirror_cell, dragon)
+            if not available_cells:
+                raise ValueError(
+                    "Not enough unoccupied cells to place dragons on this "
+                    "board"
+                )
+            # Swap the chosen cell with the last one so it can be popped
+            choice = rng.randrange(len(available_cells))
+            index = available_cells[choice]
+            available_cells[choice] = available_cells[-1]
+            available_cells.pop()
+
+            # The cell mirrored through the center of the board
+            mirror = len(board) - index - 1
+            if not board[mirror]:
+                self._place(index, DRAGON_CODE)
+                self._place(mirror, DRAGON_CODE)
                 remaining_dragons -= 2
 
     def in_bounds(self, cell):
@@ -439,92 +733,183 @@ class Board:
     def inside_border(self, cell):
         return 0 < cell.row < self.height - 1 and 0 < cell.col < self.width - 1
 
+    def neighbors(self, cell):
+        # Unlike Cell.neighbors, only includes cells on the board
+        if not self.in_bounds(cell):
+            return ()
+        return self.neighbor_table[cell.row][cell.col]
+
+    def neighbor_indices_of(self, cell):
+        # Like neighbors, but gives the indices of the cells in self.board
+        if not self.in_bounds(cell):
+            return ()
+        return self.neighbor_indices[cell.row * self.width + cell.col]
+
     def get_piece(self, cell):
-        return self.board[cell.row][cell.col] if self.in_bounds(cell) else None
+        if not self.in_bounds(cell):
+            return None
+        return CODE_TO_PIECE[self.board[cell.row * self.width + cell.col]]
 
     def set_piece(self, cell, piece):
         if self.in_bounds(cell):
-            self.board[cell.row][cell.col] = piece
+            self._place(
+                cell.row * self.width + cell.col,
+                piece.code if piece is not None else EMPTY,
+            )
 
     def get_boost(self, cell):
-        boost = 1
-        for neighbor in cell.neighbors:
-            if self.get_piece(neighbor):
-                boost += 1
-        return boost
+        if not self.in_bounds(cell):
+            return 1
+        return self.boosts[cell.row * self.width + cell.col]
 
     def find_path(self, source, destination, target_distance=None):
         # A* with Manhattan distance heuristic (cell_distance)
-        worklist = [Path([source], cell_distance(source, destination))]
-        heapify(worklist)
+        # Nothing in the package calls this; move validation goes through
+        # _path_exists, and it is kept for external callers
+        # Worklist entries are (estimate, tiebreaker, length, visited, node)
+        # tuples, so the heap never has to compare nodes
+        # visited is a bitboard of the cells on the path, plus the occupied
+        # cells, which paths cannot enter either
+        # Each node is a (cell, parent node) pair, so extending a path never
+        # copies it; the full path is only rebuilt once one is found
+        width = self.width
+        tiebreaker = count()
+        worklist = [
+            (
+                cell_distance(source, destination),
+                next(tiebreaker),
+                0,
+                self.occupied
+                | (
+                    1 << (source.row * width + source.col)
+                    if self.in_bounds(source)
+                    else 0
+                ),
+                (source, None),
+            )
+        ]
 
         while len(worklist) > 0:
-            path = heappop(worklist)
+            _, _, length, visited, node = heappop(worklist)
+            cell = node[0]
 
-            if path.end == destination and (
-                target_distance is None or len(path) == target_distance
+            if cell == destination and (
+                target_distance is None or length == target_distance
             ):
-                return path
-
-            if len(path) == target_distance:
+                path = []
+                while node is not None:
+                    path.append(node[0])
+                    node = node[1]
+                path.reverse()
+                return Path(path)
+
+            if length == target_distance:
                 continue
 
-            for neighbor in path.end.neighbors:
-                if not self.in_bounds(neighbor) or neighbor in path:
-                    continue
-
-                piece = self.get_piece(neighbor)
-                if piece is not None:
+            for neighbor in self.neighbors(cell):
+                bit = 1 << (neighbor.row * width + neighbor.col)
+                if visited & bit:
                     continue
 
                 heappush(
                     worklist,
-                    Path(
-                        path.path + [neighbor],
-                        len(path) + 1 + cell_distance(neighbor, destination),
+                    (
+                        length + 1 + cell_distance(neighbor, destination),
+                        next(tiebreaker),
+                        length + 1,
+                        visited | bit,
+                        (neighbor, node),
                     ),
                 )
         return None
 
     def path_exists(self, move):
-        return (
-            self.find_path(move.start, move.end, self.get_boost(move.start))
-            is not None
+        # Whether the piece at the start of the move can reach the end of the
+        # move in exactly as many steps as its boost, moving only through
+        # empty cells and never visiting a cell twice
+        start = move.start
+        end = move.end
+        if not self.in_bounds(start) or not self.in_bounds(end):
+            return False
+        return self._path_exists(
+            start.row * self.width + start.col,
+            end.row * self.width + end.col,
         )
 
+    def _path_exists(self, start_index, end_index):
+        # path_exists for cell indices, which must be on the board
+        board = self.board
+        # Walks never step onto occupied cells, so they cannot end on one
+        if board[end_index]:
+            return False
+        steps = self.boosts[start_index]
+        distances = self.distance_table[end_index]
+        # Each step changes the distance to the end by exactly one, so the
+        # surplus steps must be non-negative and even
+        surplus = steps - distances[start_index]
+        if surplus < 0 or surplus % 2 != 0:
+            return False
+
+        # Depth-first search bounded by the remaining steps, run on an
+        # explicit stack to avoid a Python call per step
+        # Stack entries are (cell index, remaining steps, visited) triples,
+        # where visited is a bitboard of the cells on the current walk; it
+        # starts out with the occupied cells, so one test rules out both
+        # Neighbors that are too far from the destination are pruned, so the
+        # destination has been reached when no steps remain
+        neighbor_indices = self.neighbor_indices
+        stack = [(start_index, steps, self.occupied | 1 << start_index)]
+        while stack:
+            index, steps, visited = stack.pop()
+            if steps == 0:
+                return True
+            steps -= 1
+            for neighbor in neighbor_indices[index]:
+                bit = 1 << neighbor
+                if visited & bit or distances[neighbor] > steps:
+                    continue
+                stack.append((neighbor, steps, visited | bit))
+        return False
+
     def can_move_dragon(self, cell, owner):
         assert owner != DRAGON_OWNER
-        assert self.get_piece(cell).piece_type is PieceTypes.DRAGON
-        for neighbor in cell.neighbors:
-            neighbor_piece = self.get_piece(neighbor)
-            if neighbor_piece and neighbor_piece.owner == owner:
+        board = self.board
+        assert board[cell.row * self.width + cell.col] == DRAGON_CODE
+        for neighbor in self.neighbor_indices_of(cell):
+            code = board[neighbor]
+            if code and code >> OWNER_SHIFT == owner:
                 return True
         return False
 
     def can_build_tower(self, cell, owner):
-        if self.get_piece(cell):
+        # Cells on the border (or off the board) have fewer than 4 neighbors
+        neighbors = self.neighbor_indices_of(cell)
+        if len(neighbors) < 4:
+            return False
+
+        board = self.board
+        if board[cell.row * self.width + cell.col]:
             return False
 
-        for neighbor in cell.neighbors:
-            neighbor_piece = self.get_piece(neighbor)
-            if not neighbor_piece or neighbor_piece.owner != owner:
+        for neighbor in neighbors:
+            code = board[neighbor]
+            if not code or code >> OWNER_SHIFT != owner:
                 return False
 
-        owner_towers = self.piece_counts.get(Piece(owner, PieceTypes.TOWER), 0)
+        owner_towers = self.piece_counts.get(piece_code(owner, TOWER_ID), 0)
         return owner_towers < self.ruleset.max_towers
 
     def can_promote_knight(self, cell, owner):
-        piece = self.get_piece(cell)
-        if (
-            not piece
-            or piece.owner != owner
-            or piece.piece_type != PieceTypes.PAWN
-        ):
+        if not self.in_bounds(cell):
+            return False
+        board = self.board
+        pawn_code = piece_code(owner, PAWN_ID)
+        if board[cell.row * self.width + cell.col] != pawn_code:
             return False
 
         piece_counts = self.piece_counts
-        knight = Piece(owner, PieceTypes.KNIGHT)
-        tower = Piece(owner, PieceTypes.TOWER)
+        knight = piece_code(owner, KNIGHT_ID)
+        tower = piece_code(owner, TOWER_ID)
         if (
             knight in piece_counts
             and tower in piece_counts
@@ -533,61 +918,74 @@ class Board:
         ):
             return False
 
-        for neighbor in cell.neighbors:
-            neighbor_piece = self.get_piece(neighbor)
-            if (
-                neighbor_piece
-                and neighbor_piece.owner == owner
-                and neighbor_piece.piece_type is PieceTypes.TOWER
-            ):
+        tower_code = piece_code(owner, TOWER_ID)
+        for neighbor in self.neighbor_indices_of(cell):
+            if board[neighbor] == tower_code:
                 return True
 
         return False
 
     def get_move_error(self, move, owner, skip_pathfinding=False):
-        if move.start == move.end:
-            if self.can_build_tower(move.start, owner):
+        start = move.start
+        end = move.end
+        if start == end:
+            if self.can_build_tower(start, owner):
                 return ""
-            if self.can_promote_knight(move.start, owner):
+            if self.can_promote_knight(start, owner):
                 return ""
             return (
                 "You cannot build a tower here nor promote a pawn to a "
                 "knight here."
             )
 
-        piece = self.get_piece(move.start)
-        destination = self.get_piece(move.end)
-        boost = self.get_boost(move.start)
-        if not piece:
+        # Checks are ordered from cheapest to most expensive, so that most
+        # invalid moves are rejected before searching for a path
+        # Bounds are checked inline, and each cell is indexed only once
+        height = self.height
+        width = self.width
+        if not (0 <= end.row < height and 0 <= end.col < width):
+            return f"{self.format_cell(end)} is out of bounds."
+        if not (0 <= start.row < height and 0 <= start.col < width):
+            return f"There is no piece at {self.format_cell(start)} to move."
+        board = self.board
+        start_index = start.row * width + start.col
+        end_index = end.row * width + end.col
+        # The checks compare raw piece codes; pieces are only decoded to
+        # name them in error messages
+        code = board[start_index]
+        if not code:
+            return f"There is no piece at {self.format_cell(start)} to move."
+        piece_id = code & PIECE_TYPE_MASK
+        if code >> OWNER_SHIFT not in (owner, DRAGON_OWNER):
             return (
-                f"There is no piece at {self.format_cell(move.start)} "
-                "to move."
+                f"You are not the owner of the {CODE_TO_PIECE[code].name} at "
+                f"{self.format_cell(start)}."
             )
-        if piece.piece_type is PieceTypes.DRAGON and not self.can_move_dragon(
-            move.start, owner
-        ):
+        if piece_id == TOWER_ID:
+            return "Towers cannot move."
+        destination = board[end_index]
+        if destination:
+            if piece_id != KNIGHT_ID:
+                return (
+                    f"A {CODE_TO_PIECE[code].name} cannot capture pieces "
+                    "directly."
+                )
+            if destination >> OWNER_SHIFT == owner:
+                return "You cannot capture your own piece."
+            if destination == DRAGON_CODE:
+                return "Dragons cannot be captured."
+        if piece_id == DRAGON_ID and not self.can_move_dragon(start, owner):
             return (
-                f"To move the {piece.name} at "
-                f"{self.format_cell(move.start)}, "
-                "you must have an adjacent piece."
+                f"To move the {CODE_TO_PIECE[code].name} at "
+                f"{self.format_cell(start)}, you must have an adjacent piece."
             )
-        if piece.owner not in (owner, DRAGON_OWNER):
+        if not skip_pathfinding and not self._path_exists(
+            start_index, end_index
+        ):
             return (
-                f"You are not the owner of the {piece.name} at "
-                f"{self.format_cell(move.start)}."
+                f"You must move this piece exactly {self.boosts[start_index]} "
+                "cell(s)."
             )
-        if piece.piece_type is PieceTypes.TOWER:
-            return "Towers cannot move."
-        if not skip_pathfinding and not self.path_exists(move):
-            return f"You must move this piece exactly {boost} cell(s)."
-        if not self.in_bounds(move.end):
-            return f"{self.format_cell(move.end)} is out of bounds."
-        if destination and piece.piece_type != PieceTypes.KNIGHT:
-            return f"A {piece.name} cannot capture pieces directly."
-        if destination and destination.owner == owner:
-            return "You cannot capture your own piece."
-        if destination and destination.piece_type is PieceTypes.DRAGON:
-            return "Dragons cannot be captured."
         return ""
 
     def is_valid(self, move, owner, skip_pathfinding=False):
@@ -596,45 +994,53 @@ class Board:
     def capture(self, cell, owner):
         # Processes captures made by the piece moved to the given cell by the
         # given owner
-        piece = self.get_piece(cell)
-        assert piece
-        assert (
-            piece.piece_type is PieceTypes.PAWN
-            or piece.piece_type is PieceTypes.DRAGON
+        board = self.board
+        assert board[cell.row * self.width + cell.col] & PIECE_TYPE_MASK in (
+            PAWN_ID,
+            DRAGON_ID,
         )
+        height = self.height
+        width = self.width
         captures = 0
-        for neighbor in cell.neighbors:
-            neighbor_piece = self.get_piece(neighbor)
-            if (
-                neighbor_piece
-                and neighbor_piece.owner != owner
-                and neighbor_piece.owner != DRAGON_OWNER
+        for row_offset, col_offset in DIRECTIONS:
+            # The flanking cell lies beyond the neighbor, so if the flanking
+            # cell is in bounds, the neighbor is as well
+            flank_row = cell.row + 2 * row_offset
+            flank_col = cell.col + 2 * col_offset
+            if not (0 <= flank_row < height and 0 <= flank_col < width):
+                continue
+            neighbor = (cell.row + row_offset) * width + cell.col + col_offset
+            neighbor_code = board[neighbor]
+            if not neighbor_code or neighbor_code >> OWNER_SHIFT in (
+                owner,
+                DRAGON_OWNER,
             ):
-                flank = Cell(
-                    neighbor.row + (neighbor.row - cell.row),
-                    neighbor.col + (neighbor.col - cell.col),
-                )
-                flanking_piece = self.get_piece(flank)
-                if flanking_piece and flanking_piece.owner in (
-                    owner,
-                    DRAGON_OWNER,
-                ):
-                    self.set_piece(neighbor, None)
-                    captures += 1
+                continue
+            flanking_code = board[flank_row * width + flank_col]
+            if flanking_code and flanking_code >> OWNER_SHIFT in (
+                owner,
+                DRAGON_OWNER,
+            ):
+                self._place(neighbor, EMPTY)
+                captures += 1
         return captures
 
     @property
     def defeated(self):
+        # Tally every owner's pieces in a single pass over the counts
+        totals = {}
+        towers = {}
+        for code, number in self.piece_counts.items():
+            owner = code >> OWNER_SHIFT
+            totals[owner] = totals.get(owner, 0) + number
+            if code & PIECE_TYPE_MASK == TOWER_ID:
+                towers[owner] = number
+
         defeated = set()
-        piece_counts = self.piece_counts
         for owner in range(self.owners):
             if owner != DRAGON_OWNER:
-                owner_total = 0
-                for piece_type in PieceTypes:
-                    count = piece_counts.get(Piece(owner, piece_type))
-                    if count:
-                        owner_total += count
-                owner_towers = piece_counts.get(Piece(owner, PieceTypes.TOWER))
+                owner_total = totals.get(owner, 0)
+                owner_towers = towers.get(owner)
                 tower_victory_possible = (
                     self.ruleset.tower_victory
                     and owner_towers
@@ -658,16 +1064,23 @@ class Board:
         return None
 
     def is_dragon_tower(self, cell):
-        tower = self.get_piece(cell)
-        if not tower or tower.piece_type is not PieceTypes.TOWER:
+        if not self.in_bounds(cell):
             return False
+        return self._is_dragon_tower(cell.row * self.width + cell.col)
 
-        for neighbor in cell.neighbors:
-            dragon = self.get_piece(neighbor)
-            if dragon is None or dragon.piece_type != PieceTypes.DRAGON:
-                return False
+    def _is_dragon_tower(self, index):
+        # is_dragon_tower for a cell index, which must be on the board
+        # Cells on the border have fewer than 4 neighbors, and towers can
+        # only be built off the border
+        if len(self.neighbor_indices[index]) < 4:
+            return False
+
+        if self.board[index] & PIECE_TYPE_MASK != TOWER_ID:
+            return False
 
-        return True
+        # Surrounded when every neighbor is in the dragon bitboard
+        mask = self.neighbor_masks[index]
+        return self.dragons & mask == mask
 
     def move(self, move, owner, apply=True):
         if not apply:
@@ -675,37 +1088,31 @@ class Board:
             new_board.move(move, owner, apply=True)
             return new_board
 
-        # Clear cached piece counts since the board may change
-        self.piece_counts_cache = None
-
-        if move.start == move.end:
-            piece = self.get_piece(move.start)
-            if not piece:
+        # Moves are assumed to be valid, so both cells are on the board and
+        # can be compared by index
+        start = move.start.row * self.width + move.start.col
+        end = move.end.row * self.width + move.end.col
+        if start == end:
+            if not self.board[start]:
                 # Build tower
-                self.board[move.start.row][move.start.col] = Piece(
-                    owner, PieceTypes.TOWER
-                )
+                self._place(start, piece_code(owner, TOWER_ID))
             else:
                 # Promote knight
-                self.board[move.start.row][move.start.col] = Piece(
-                    owner, PieceTypes.KNIGHT
-                )
+                self._place(start, piece_code(owner, KNIGHT_ID))
         else:
             # Move piece
-            piece = self.board[move.start.row][move.start.col]
-            target = self.board[move.end.row][move.end.col]
-            self.set_piece(move.start, None)
-            self.set_piece(move.end, piece)
+            code = self.board[start]
+            target = self.board[end]
+            self._place(start, EMPTY)
+            self._place(end, code)
+            piece_id = code & PIECE_TYPE_MASK
 
             captures = 0
             # Check for direct knight capture
-            if piece.piece_type is PieceTypes.KNIGHT and target:
+            if piece_id == KNIGHT_ID and target:
                 captures = 1
             # Check for pawn or dragon capture
-            elif (
-                piece.piece_type is PieceTypes.PAWN
-                or piece.piece_type is PieceTypes.DRAGON
-            ):
+            elif piece_id == PAWN_ID or piece_id == DRAGON_ID:
                 captures = self.capture(move.end, owner)
 
             # Check for capture victory if any pieces were captured
@@ -717,56 +1124,60 @@ class Board:
             # Check for tower victory if a dragon was moved
             # Must be checked after captures in case a player captured a tower
             # by moving a fourth dragon next to it
-            if (
-                self.ruleset.tower_victory
-                and piece.piece_type is PieceTypes.DRAGON
-            ):
-                for neighbor in move.end.neighbors:
-                    if self.is_dragon_tower(neighbor):
-                        return self.get_piece(neighbor).owner
+            if self.ruleset.tower_victory and piece_id == DRAGON_ID:
+                # Only the neighbors of the dragon can have become dragon
+                # towers, and the winner is the owner of the tower
+                for neighbor in self.neighbor_indices[end]:
+                    if self._is_dragon_tower(neighbor):
+                        return self.board[neighbor] >> OWNER_SHIFT
         return None
 
     def get_piece_moves(self, cell, owner=None):
         # Ensure that a piece is present and movable
-        piece = self.get_piece(cell)
-        if piece is None or piece.piece_type is PieceTypes.TOWER:
+        if not self.in_bounds(cell):
+            return set()
+        code = self.board[cell.row * self.width + cell.col]
+        if not code or code & PIECE_TYPE_MASK == TOWER_ID:
             return set()
 
         # Ensure that the owner can actually move this piece
+        piece_owner = code >> OWNER_SHIFT
         if owner is None:
-            owner = piece.owner
-        elif owner != piece.owner and not (
-            piece.owner == DRAGON_OWNER and self.can_move_dragon(cell, owner)
+            owner = piece_owner
+        elif owner != piece_owner and not (
+            piece_owner == DRAGON_OWNER and self.can_move_dragon(cell, owner)
         ):
             return set()
 
-        # Breadth-first search to find all possible moves
-        boost = self.get_boost(cell)
-        moves = set()
-        worklist = [Path([cell])]
-        heapify(worklist)
-
-        while len(worklist) > 0:
-            path = heappop(worklist)
-
-            if len(path) > boost:
-                return moves
-
-            if len(path) == boost:
-                move = Move(path.start, path.end)
-                if self.is_valid(move, owner, skip_pathfinding=True):
-                    moves.add(move)
+        # Depth-first search for the end of every walk of exactly boost
+        # steps, as in _path_exists
+        # Stack entries are (cell index, remaining steps, visited) triples,
+        # where visited is a bitboard of the cells on the walk and the
+        # occupied cells
+        neighbor_indices = self.neighbor_indices
+        start = cell.row * self.width + cell.col
+        ends = set()
+        stack = [(start, self.boosts[start], self.occupied | 1 << start)]
+        while stack:
+            index, steps, visited = stack.pop()
+            if steps == 0:
+                ends.add(index)
                 continue
-
-            for neighbor in path.end.neighbors:
-                if not self.in_bounds(neighbor) or neighbor in path:
+            steps -= 1
+            for neighbor in neighbor_indices[index]:
+                bit = 1 << neighbor
+                if visited & bit:
                     continue
-
-                piece = self.get_piece(neighbor)
-                if piece is not None:
-                    continue
-
-                heappush(worklist, Path(path.path + [neighbor]))
+                stack.append((neighbor, steps, visited | bit))
+
+        cells = self.cells
+        moves = {Move(cell, cells[index]) for index in ends}
+        # Walks only end on empty cells, so the moves differ only in checks
+        # that they all pass; validating one of them validates them all
+        if moves and not self.is_valid(
+            next(iter(moves)), owner, skip_pathfinding=True
+        ):
+            return set()
         return moves
 
     def get_owner_moves(self, owner):
@@ -790,17 +1201,18 @@ class Board:
         )
 
     def mobility_score(self, cell):
-        piece = self.get_piece(cell)
-        if not piece:
+        if not self.in_bounds(cell):
             return 0
+        index = cell.row * self.width + cell.col
+        piece_id = self.board[index] & PIECE_TYPE_MASK
 
-        if piece.piece_type is PieceTypes.PAWN and self.inside_border(cell):
+        if piece_id == PAWN_ID and self.inside_border(cell):
             return ACTIVE_PAWN_SCORE
 
-        if piece.piece_type is not PieceTypes.KNIGHT:
+        if piece_id != KNIGHT_ID:
             return 0
 
-        boost = self.get_boost(cell)
+        boost = self.boosts[index]
         score = 0
         if 1 < boost < 5:
             score += MOBILE_KNIGHT_SCORE * boost
@@ -809,17 +1221,15 @@ class Board:
         return score
 
     def count_dragon_circle(self, cell):
-        piece = self.get_piece(cell)
-        if piece.piece_type is not PieceTypes.TOWER:
+        board = self.board
+        code = board[cell.row * self.width + cell.col]
+        if code & PIECE_TYPE_MASK != TOWER_ID:
             return 0
 
         dragon_circle = 0
-        for neighbor in cell.neighbors:
-            neighbor_piece = self.get_piece(neighbor)
-            if (
-                neighbor_piece
-                and neighbor_piece.piece_type == PieceTypes.DRAGON
-            ):
+        for neighbor in self.neighbor_indices_of(cell):
+            code = board[neighbor]
+            if code & PIECE_TYPE_MASK == DRAGON_ID:
                 dragon_circle += 1
         return dragon_circle
 
@@ -827,35 +1237,32 @@ class Board:
         if not self.inside_border(cell):
             return 0
 
-        piece = self.get_piece(cell)
-        if piece:
+        board = self.board
+        if board[cell.row * self.width + cell.col]:
             return 0
 
         # Don't award any points if there is just one piece in the "circle"
         construction_circle = -1
-        for neighbor in cell.neighbors:
-            neighbor_piece = self.get_piece(neighbor)
-            if neighbor_piece:
-                if neighbor_piece.owner == owner:
+        for neighbor in self.neighbor_indices_of(cell):
+            code = board[neighbor]
+            if code:
+                if code >> OWNER_SHIFT == owner:
                     construction_circle += 1
                 else:
                     construction_circle -= 1
         return max(construction_circle, 0)
 
     def count_dragon_claims(self, cell, owner):
-        piece = self.get_piece(cell)
-        if piece.piece_type is not PieceTypes.DRAGON:
+        board = self.board
+        if board[cell.row * self.width + cell.col] != DRAGON_CODE:
             return 0
 
         dragon_claims = 0
-        for neighbor in cell.neighbors:
-            neighbor_piece = self.get_piece(neighbor)
+        for neighbor in self.neighbor_indices_of(cell):
+            code = board[neighbor]
             claimants = set()
-            if (
-                neighbor_piece
-                and neighbor_piece.piece_type != PieceTypes.DRAGON
-            ):
-                claimants.add(neighbor_piece.owner)
+            if code and code & PIECE_TYPE_MASK != DRAGON_ID:
+                claimants.add(code >> OWNER_SHIFT)
             for claimant in claimants:
                 if claimant == owner:
                     dragon_claims += 1
@@ -870,12 +1277,15 @@ class Board:
         max_construction_circle = 0
         dragon_claims = 0
         owner_pieces = [0] * self.owners
-        for cell in self.cells:
-            piece = self.get_piece(cell)
-            if piece:
+        board = self.board
+        # Cells are in the same row-major order as the board
+        for index, cell in enumerate(self.cells):
+            code = board[index]
+            if code:
+                code_owner = code >> OWNER_SHIFT
                 # Owned piece valuation
-                if piece.owner == owner:
-                    score += piece.piece_type.value.score
+                if code_owner == owner:
+                    score += CODE_SCORES[code]
                     score += self.mobility_score(cell)
                     max_dragon_circle = max(
                         self.count_dragon_circle(cell), max_dragon_circle
@@ -884,14 +1294,14 @@ class Board:
                         return inf
 
                 # Dragon claim scoring
-                elif piece.piece_type is PieceTypes.DRAGON:
+                elif code == DRAGON_CODE:
                     dragon_claims += self.count_dragon_claims(cell, owner)
 
                 # Opponent piece valuation
                 else:
-                    score -= piece.piece_type.value.score
+                    score -= CODE_SCORES[code]
 
-                owner_pieces[piece.owner] += 1
+                owner_pieces[code_owner] += 1
             else:
                 # Construction circle scoring
                 max_construction_circle = max(
@@ -922,13 +1332,29 @@ class Board:
 
 
 class Game:
-    def __init__(self, ruleset, depth=4, cache=True):
+    __slots__ = (
+        "ruleset",
+        "rng",
+        "board",
+        "players",
+        "depth",
+        "turn",
+        "history",
+        "maxi_cache",
+        "mini_cache",
+        "recursions",
+        "cache_hits",
+    )
+
+    def __init__(self, ruleset, depth=4, cache=True, rng=None):
         self.ruleset = ruleset
-        self.board = Board(ruleset)
+        self.rng = rng if rng is not None else random
+        self.board = Board(ruleset, rng=self.rng)
         self.players = ruleset.players
         self.depth = depth
         self.turn = 1
-        self.history = [str(self.board)]
+        # Journals of the writes made by each move, for undoing moves
+        self.history = []
         if cache:
             self.maxi_cache = {}
             self.mini_cache = {}
@@ -938,6 +1364,13 @@ class Game:
         self.recursions = 0
         self.cache_hits = 0
 
+    def reset(self):
+        # Starts a new game on the same board; the AI caches are keyed by
+        # position, so they stay valid
+        self.board.reset(self.rng)
+        self.turn = 1
+        self.history = []
+
     def get_next_turn(self, turn=None):
         if turn is None:
             turn = self.turn
@@ -970,16 +1403,19 @@ class Game:
         return self.board.get_move_error(move, self.turn)
 
     def move(self, move):
-        winner = self.board.move(move, self.turn)
+        self.board.journal = []
+        try:
+            winner = self.board.move(move, self.turn)
+            self.history.append(self.board.journal)
+        finally:
+            self.board.journal = None
         self.next_turn()
-        self.history.append(str(self.board))
         return winner
 
     def undo(self):
-        if len(self.history) > 1:
+        if self.history:
             self.prev_turn()
-            self.history.pop()
-            self.board.load(self.history[-1])
+            self.board.revert(self.history.pop())
             return ""
         return "There are no previous moves to undo."
 
@@ -991,7 +1427,7 @@ class Game:
     def get_best_move(self):
         # Choose a completely random move at AI depth 0
         if self.depth == 0:
-            return random.choice(self.board.get_owner_moves(self.turn))
+            return self.rng.choice(self.board.get_owner_moves(self.turn))
 
         start_time = time()
         self.recursions = 0
@@ -1206,6 +1642,13 @@ def main():
         help="disable caching the best AI move for previously "
         "considered board states",
     )
+    parser.add_argument(
+        "-s",
+        "--seed",
+        type=int,
+        help="seed for dragon placement and random AI moves, "
+        "for reproducible games",
+    )
     parser.set_defaults(color=TERMCOLOR)
     parser.set_defaults(cache=True)
     args = parser.parse_args()
@@ -1225,7 +1668,8 @@ def main():
         print(f"AI minimax depth must be non-negative (was {args.depth})")
         return 1
 
-    game = Game(rulesets[args.ruleset], args.depth, args.cache)
+    rng = random.Random(args.seed) if args.seed is not None else None
+    game = Game(rulesets[args.ruleset], args.depth, args.cache, rng)
     message = ""
     winner = None
     auto = args.auto
@@ -1299,16 +1743,14 @@ def main():
                 winner = game.forfeit()
             elif move_input == "exit":
                 return 0
+            elif not MOVE_PATTERN.fullmatch(move_input):
+                message = (
+                    "Moves should be given in algebraic notation.\n"
+                    'e.g. "a1b2" to move from A1 to B2.'
+                )
             else:
-                try:
-                    move = game.board.parse_move(move_input)
-                except (ValueError, IndexError):
-                    message = (
-                        "Moves should be given in algebraic notation.\n"
-                        'e.g. "a1b2" to move from A1 to B2.'
-                    )
-                else:
-                    message = game.get_move_error(move)
-                    if not message:
-                        winner = game.move(move)
-                        moved = True
+                move = game.board.parse_move(move_input)
+                message = game.get_move_error(move)
+                if not message:
+                    winner = game.move(move)
+                    moved = True
@@ -2,14 +2,27 @@
 Boost Discord bot.
 """
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
 import sys
 
 import discord
 
-from .boost import Game
+from .boost import Game, MOVE_PATTERN
 from .rulesets import rulesets, DEFAULT_RULESET
 from .graphics import render_for_discord, RendererNotFoundError
 
+# uvloop is an optional, faster event loop; its policy has to be set before
+# the client is created below, since the client takes the current event loop
+# (uvloop.install is deprecated, so set the policy directly)
+try:
+    import uvloop
+except ImportError:
+    pass
+else:
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
 HELP = """\
 **Commands:**
 - `/boost`: view the current state of the game board
@@ -28,12 +41,26 @@ designed by Dr. Brady J. Garvin (<https://cse.unl.edu/~bgarvin/>).
 - Author: Aaron Friesen - <https://maugrift.com>
 - Source Code: <https://github.com/Maugrift/boost>"""
 
+# Replies to the commands that only print text
+REPLIES = {
+    "help": HELP,
+    "info": INFO,
+}
+
 # If true, each Discord user may control multiple groups of pieces in the game
 # Playing on another registered player's turn is still forbidden
 DUPLICATE_PLAYERS = True
 COLOR = False
-BOARD_IMAGE_SIZE = 1024
+# Discord shows images in chat at about half this size, and both rendering and
+# uploading scale with the pixel count
+BOARD_IMAGE_SIZE = 512
 BOARD_IMAGE_BACKGROUND_RGBA = "dededeff"
+COMMAND_PREFIX = "/boost"
+# Boards are rendered by a small pool of worker threads, so that renders for
+# several channels overlap with each other and with the event loop, without
+# starting an unbounded number of renderer processes at once
+RENDER_WORKERS = 4
+render_executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS)
 
 
 class GameWrapper:
@@ -43,7 +70,7 @@ class GameWrapper:
         self.users = [None] * ruleset.players
 
     def reset(self):
-        self.game = Game(self.ruleset)
+        self.game.reset()
         self.users = [None] * self.ruleset.players
 
     @property
@@ -63,10 +90,16 @@ class GameWrapper:
             return f"**{self.current_user}'s Turn**"
         return f"**Player {self.game.turn}'s Turn** (e.g. `/boost a1b2`)"
 
-    def _build_message(self, text):
+    async def _build_message(self, text, board, board_string):
+        # Rendering blocks, so it runs in a worker thread to keep the event
+        # loop responsive; callers pass a copy of the board and its text form
+        # taken before awaiting, since other messages may change the game
+        # while it renders
         try:
-            image = render_for_discord(
-                self.game.board,
+            image = await asyncio.get_running_loop().run_in_executor(
+                render_executor,
+                render_for_discord,
+                board,
                 "board.png",
                 BOARD_IMAGE_SIZE,
                 BOARD_IMAGE_SIZE,
@@ -78,20 +111,26 @@ class GameWrapper:
             }
         except RendererNotFoundError:
             return {
-                "content": self.board_string + text,
+                "content": board_string + text,
             }
 
-    @property
-    def message(self):
-        return self._build_message(self.player_string)
+    async def message(self):
+        return await self._build_message(
+            self.player_string, self.game.board.copy(), self.board_string
+        )
 
-    def game_over(self, winner):
+    async def game_over(self, winner):
         winner_string = self.users[winner - 1]
         if not winner_string:
             winner_string = f"Player {winner}"
-        result = self._build_message(f"{winner_string} won the game!")
+        # Reset before rendering, so that commands handled during the render
+        # already see the new game
+        board = self.game.board.copy()
+        board_string = self.board_string
         self.reset()
-        return result
+        return await self._build_message(
+            f"{winner_string} won the game!", board, board_string
+        )
 
 
 client = discord.Client()
@@ -105,86 +144,95 @@ async def on_ready():
 
 @client.event
 async def on_message(message):
+    # Most messages are not commands, so rule those out first
+    content = message.content
+    if not content.startswith(COMMAND_PREFIX):
+        return
+
     if message.author == client.user:
         return
 
-    if message.content.startswith("/boost"):
-        wrapper = wrappers.get(message.channel.id)
-        if not wrapper:
-            wrapper = GameWrapper(rulesets[DEFAULT_RULESET])
-            wrappers[message.channel.id] = wrapper
+    wrapper = wrappers.get(message.channel.id)
+    if not wrapper:
+        wrapper = GameWrapper(rulesets[DEFAULT_RULESET])
+        wrappers[message.channel.id] = wrapper
 
-        data = message.content.split()
-        if len(data) == 1:
-            await message.channel.send(**wrapper.message)
-            return
+    data = content.split()
+    if len(data) == 1:
+        await message.channel.send(**await wrapper.message())
+        return
 
-        move_input = data[1]
-        if move_input == "new":
-            wrapper.reset()
-            await message.channel.send(**wrapper.message)
-            return
+    move_input = data[1]
+    if move_input == "new":
+        wrapper.reset()
+        await message.channel.send(**await wrapper.message())
+        return
 
-        if move_input == "help":
-            await message.channel.send(HELP)
-            return
+    # Commands that only print text, and need no player or game state
+    reply = REPLIES.get(move_input)
+    if reply:
+        await message.channel.send(reply)
+        return
 
-        if move_input == "info":
-            await message.channel.send(INFO)
-            return
+    user = message.author.mention
+    if user not in wrapper.users and None not in wrapper.users:
+        await message.channel.send("You are not a player in this game.")
+        return
 
-        user = message.author.mention
-        if user not in wrapper.users and None not in wrapper.users:
-            await message.channel.send("You are not a player in this game.")
-            return
+    game = wrapper.game
+    winner = None
+    if move_input == "undo":
+        error = game.undo()
+        if error:
+            await message.channel.send(error)
+        else:
+            await message.channel.send(**await wrapper.message())
+        return
 
-        game = wrapper.game
-        winner = None
-        if move_input == "undo":
-            error = game.undo()
-            if error:
-                await message.channel.send(error)
-            else:
-                await message.channel.send(**wrapper.message)
+    if move_input == "forfeit":
+        winner = wrapper.game.forfeit()
+    else:
+        if (wrapper.current_user and user != wrapper.current_user) or (
+            not DUPLICATE_PLAYERS
+            and not wrapper.current_user
+            and user in wrapper.users
+        ):
+            await message.channel.send("It is not your turn to play.")
             return
+        if not wrapper.current_user:
+            wrapper.set_current_user(user)
+
+        # Checking the shape first avoids raising on typos, and parse_move
+        # cannot fail on anything that matches
+        if not MOVE_PATTERN.fullmatch(move_input):
+            await message.channel.send(
+                "Unrecognized command or move. For a list of commands, "
+                "run `/boost help`."
+            )
+            return
+        move = game.board.parse_move(move_input)
+        error = game.get_move_error(move)
+        if error:
+            await message.channel.send(error)
+            return
+        winner = game.move(move)
 
-        if move_input == "forfeit":
-            winner = wrapper.game.forfeit()
-        else:
-            if (wrapper.current_user and user != wrapper.current_user) or (
-                not DUPLICATE_PLAYERS
-                and not wrapper.current_user
-                and user in wrapper.users
-            ):
-                await message.channel.send("It is not your turn to play.")
-                return
-            if not wrapper.current_user:
-                wrapper.set_current_user(user)
-
-            try:
-                move = game.board.parse_move(move_input)
-            except ValueError:
-                await message.channel.send(
-                    "Unrecognized command or move. For a list of commands, "
-                    "run `/boost help`."
-                )
-                return
-            else:
-                error = game.get_move_error(move)
-                if error:
-                    await message.channel.send(error)
-                    return
-                winner = game.move(move)
-
-        if winner:
-            await message.channel.send(**wrapper.game_over(winner))
-        else:
-            await message.channel.send(**wrapper.message)
+    if winner:
+        await message.channel.send(**await wrapper.game_over(winner))
+    else:
+        await message.channel.send(**await wrapper.message())
 
 
-# Read Discord bot token as first command line argument
+# Read Discord bot token from the DISCORD_TOKEN environment variable, which
+# keeps it out of the process list, or else as first command line argument
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Please enter your Discord bot token as a command line argument")
+    token = os.environ.get("DISCORD_TOKEN")
+    if not token and len(sys.argv) >= 2:
+        token = sys.argv[1]
+    if not token:
+        print(
+            "Please set DISCORD_TOKEN to your Discord bot token, or enter it "
+            "as a command line argument"
+        )
         sys.exit(1)
-    client.run(sys.argv[1])
+    client.run(token)
@@ -13,17 +13,94 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+from collections import OrderedDict
+from concurrent.futures import Future
 from io import BytesIO
+from threading import Lock
 
 from discord import File
 
 from .board_svg import create_board
 from .svg_to_png import render_as_png, RendererNotFoundError
 
+# Pillow is optional; when it is available, rendered boards are reduced to an
+# indexed palette, which makes the uploaded PNGs several times smaller; the
+# board is mostly flat colors, so a small palette leaves room for the
+# antialiased edges and the board's shadow
+PILLOW = True
+try:
+    from PIL import Image
+except ImportError:
+    PILLOW = False
+
+PALETTE_COLORS = 64
+
+# Rendered PNGs by board state and image settings, least recently used first
+# Rendering dominates the bot's response time, and the same position is often
+# shown more than once (e.g. by a bare /boost)
+PNG_CACHE_SIZE = 256
+png_cache = OrderedDict()
+# Renders in progress by cache key, so that concurrent requests for the same
+# board (e.g. several channels showing the starting position) wait for a
+# single render instead of each starting their own
+pending_renders = {}
+# Renders may run in worker threads, so the cache and the pending renders are
+# only touched under this lock; rendering itself happens outside of it
+png_cache_lock = Lock()
+
+
+def to_palette(png):
+    with Image.open(BytesIO(png)) as image:
+        paletted = image.quantize(PALETTE_COLORS)
+    output = BytesIO()
+    paletted.save(output, "PNG")
+    return output.getvalue()
+
+
+def render_png(board, rectangle_width, rectangle_height, background):
+    # The grid's piece codes determine the whole image
+    key = (
+        bytes(board.board),
+        board.width,
+        board.height,
+        rectangle_width,
+        rectangle_height,
+        background,
+    )
+    with png_cache_lock:
+        png = png_cache.get(key)
+        if png is not None:
+            png_cache.move_to_end(key)
+            return png
+        pending = pending_renders.get(key)
+        rendering = pending is None
+        if rendering:
+            pending = pending_renders[key] = Future()
+    if not rendering:
+        # Another thread is already rendering this board
+        return pending.result()
+
+    try:
+        svg = create_board(rectangle_width, rectangle_height, board)
+        png = render_as_png(svg, rectangle_width, rectangle_height, background)
+        if PILLOW:
+            png = to_palette(png)
+    except BaseException as error:
+        with png_cache_lock:
+            del pending_renders[key]
+        pending.set_exception(error)
+        raise
+    with png_cache_lock:
+        png_cache[key] = png
+        if len(png_cache) > PNG_CACHE_SIZE:
+            png_cache.popitem(last=False)
+        del pending_renders[key]
+    pending.set_result(png)
+    return png
+
 
 def render_for_discord(
     board, filename, rectangle_width, rectangle_height, background
 ):
-    svg = create_board(rectangle_width, rectangle_height, board)
-    png = render_as_png(svg, rectangle_width, rectangle_height, background)
+    png = render_png(board, rectangle_width, rectangle_height, background)
     return File(BytesIO(png), filename=filename)
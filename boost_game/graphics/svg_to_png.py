@@ -20,7 +20,37 @@ from string import Template
 from subprocess import run, CalledProcessError
 from tempfile import NamedTemporaryFile
 
+# CairoSVG renders in-process, without starting a renderer or writing
+# temporary files; it also needs the native Cairo library, which is reported
+# as an OSError when missing
+CAIROSVG = True
+try:
+    from cairosvg import svg2png
+except (ImportError, OSError):
+    CAIROSVG = False
 
+# Renderers that read the SVG from stdin and write the PNG to stdout, which
+# keeps both off the disk; these are tried first
+# The base URI stands in for the SVG file's location when resolving the piece
+# images, as if it had been written to the working directory
+PIPED_RENDERER_CANDIDATES = (
+    (
+        "rsvg-convert",
+        "-w",
+        "$width",
+        "-h",
+        "$height",
+        "-b",
+        "#$background",
+        "--base-uri",
+        "$base_uri",
+        "-f",
+        "png",
+    ),
+)
+
+# Renderers that need the SVG and PNG as files, including rsvg-convert again
+# for versions without --base-uri
 RENDERER_CANDIDATES = (
     (
         "rsvg-convert",
@@ -61,7 +91,39 @@ class RendererNotFoundError(OSError):
     pass
 
 
+def substitute(renderer_template, **values):
+    return [Template(arg).substitute(**values) for arg in renderer_template]
+
+
 def render_as_png(svg, width, height, background="ffffffff"):
+    if CAIROSVG:
+        # unsafe lets the <image> tags load the piece files, which is fine
+        # since the SVG always comes from board_svg
+        return svg2png(
+            bytestring=svg.encode(),
+            output_width=width,
+            output_height=height,
+            background_color=f"#{background}",
+            unsafe=True,
+        )
+
+    for renderer_template in PIPED_RENDERER_CANDIDATES:
+        renderer = substitute(
+            renderer_template,
+            width=str(width),
+            height=str(height),
+            background=background,
+            base_uri=(Path().absolute() / "board.svg").as_uri(),
+        )
+        try:
+            result = run(
+                renderer, input=svg.encode(), capture_output=True, check=True
+            )
+        except (FileNotFoundError, CalledProcessError):
+            pass
+        else:
+            return result.stdout
+
     with NamedTemporaryFile(
         "w", suffix=".svg", dir=Path(), delete=False
     ) as svg_file:
@@ -72,18 +134,15 @@ def render_as_png(svg, width, height, background="ffffffff"):
         pass
     try:
         for renderer_template in RENDERER_CANDIDATES:
+            renderer = substitute(
+                renderer_template,
+                width=str(width),
+                height=str(height),
+                background=background,
+                png_filename=png_file.name,
+                svg_filename=svg_file.name,
+            )
             try:
-                renderer = []
-                for arg in renderer_template:
-                    renderer.append(
-                        Template(arg).substitute(
-                            width=str(width),
-                            height=str(height),
-                            background=background,
-                            png_filename=png_file.name,
-                            svg_filename=svg_file.name,
-                        )
-                    )
                 run(renderer, check=True)
             except (FileNotFoundError, CalledProcessError):
                 pass
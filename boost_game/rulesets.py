@@ -126,6 +126,18 @@ P2 T1
 
 
 class Ruleset:
+    __slots__ = (
+        "board_string",
+        "width",
+        "height",
+        "players",
+        "dragons",
+        "max_towers",
+        "knights_per_tower",
+        "min_pieces",
+        "tower_victory",
+    )
+
     def __init__(
         self,
         board_string,
@@ -6,4 +6,6 @@ else
 	token_path=token.txt
 fi
 cd "$(dirname "$0")" || exit 1
-python3 -m boost_game.bot "$(cat "$token_path")"
+# Passed through the environment rather than as an argument, so that the token
+# does not show up in the process list
+DISCORD_TOKEN="$(cat "$token_path")" python3 -m boost_game.bot